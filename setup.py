@@ -1,36 +1,46 @@
-from setuptools import setup, find_packages
+from pathlib import Path
 
-with open("README.md", "r", encoding="utf-8") as fh:
-    long_description = fh.read()
+from setuptools import setup
 
-setup(
-    name="tokentracker",
-    version="1.0.0",
-    author="Team Brain (Atlas)",
-    author_email="logan@metaphy.ai",
-    description="Real-time Token Usage Monitor for AI Agents",
-    long_description=long_description,
-    long_description_content_type="text/markdown",
-    url="https://github.com/DonkRonk17/TokenTracker",
-    py_modules=["tokentracker"],
-    classifiers=[
-        "Development Status :: 5 - Production/Stable",
-        "Intended Audience :: Developers",
-        "Topic :: Software Development :: Libraries :: Python Modules",
-        "License :: OSI Approved :: MIT License",
-        "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.7",
-        "Programming Language :: Python :: 3.8",
-        "Programming Language :: Python :: 3.9",
-        "Programming Language :: Python :: 3.10",
-        "Programming Language :: Python :: 3.11",
-        "Operating System :: OS Independent",
-    ],
-    python_requires=">=3.7",
-    install_requires=[],  # Zero dependencies!
-    entry_points={
-        "console_scripts": [
-            "tokentracker=tokentracker:main",
+if __name__ == "__main__":
+    readme = Path(__file__).parent / "README.md"
+    long_description = readme.read_text(encoding="utf-8") if readme.exists() else ""
+
+    setup(
+        name="tokentracker",
+        version="1.0.0",
+        author="Team Brain (Atlas)",
+        author_email="logan@metaphy.ai",
+        description="Real-time Token Usage Monitor for AI Agents",
+        long_description=long_description,
+        long_description_content_type="text/markdown",
+        url="https://github.com/DonkRonk17/TokenTracker",
+        py_modules=["tokentracker"],
+        classifiers=[
+            "Development Status :: 5 - Production/Stable",
+            "Intended Audience :: Developers",
+            "Topic :: Software Development :: Libraries :: Python Modules",
+            "License :: OSI Approved :: MIT License",
+            "Programming Language :: Python :: 3",
+            "Programming Language :: Python :: 3.7",
+            "Programming Language :: Python :: 3.8",
+            "Programming Language :: Python :: 3.9",
+            "Programming Language :: Python :: 3.10",
+            "Programming Language :: Python :: 3.11",
+            "Operating System :: OS Independent",
         ],
-    },
-)
+        python_requires=">=3.7",
+        install_requires=[],  # Zero dependencies!
+        extras_require={
+            # Optional: parallel test runs via pytest-xdist
+            "dev": ["pytest", "pytest-xdist"],
+            # Optional: faster JSON reports
+            "fast": ["orjson"],
+            # Optional: TokenTracker.get_usage_dataframe()
+            "dataframe": ["pandas"],
+        },
+        # Plain wrapper script instead of a console_scripts entry point, so CLI
+        # startup does not pay for an entry-point metadata lookup
+        # (python -m tokentracker works too)
+        scripts=["scripts/tokentracker"],
+    )
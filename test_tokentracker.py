@@ -7,20 +7,26 @@ Tests cover:
 - Edge cases (empty input, boundaries)
 - Error handling (validation, SQL injection)
 - Integration scenarios
+- Command-line interface
 
 Run: python test_tokentracker.py
+     (runs in parallel if pytest-xdist is installed: pip install -e .[dev])
 
 Author: Atlas (Team Brain)
 For: Logan Smith / Metaphy LLC
 Date: January 22, 2026
 """
 
+import contextlib
+import importlib.util
+import io
+import json
 import unittest
 import sys
 import os
 import sqlite3
 import tempfile
-import shutil
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 from unittest.mock import patch
@@ -28,42 +34,224 @@ from unittest.mock import patch
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from tokentracker import TokenTracker
+from tokentracker import TokenTracker, _calculate_cost_cached, _json_dumps, _period_bounds, main, read_batch_file
 
+# Fixed "now" so period filters and month rollups do not depend on the wall clock
+FROZEN_NOW = datetime(2026, 1, 22, 12, 0, 0)
 
-class TestTokenTrackerCore(unittest.TestCase):
-    """Test core TokenTracker functionality."""
+
+class _FrozenDatetime(datetime):
+    """datetime whose now() always returns FROZEN_NOW."""
     
-    def setUp(self):
-        """Set up test fixtures with isolated database."""
-        # Create temp directory for test database
-        self.test_dir = tempfile.mkdtemp()
-        self.test_db = Path(self.test_dir) / "test_tokens.db"
-        self.tracker = TokenTracker(db_path=self.test_db)
+    @classmethod
+    def now(cls, tz=None):
+        return FROZEN_NOW
+
+
+class _TrackerTestBase(unittest.TestCase):
+    """Shares one tracker per test class and empties its tables before each test."""
     
-    def tearDown(self):
-        """Clean up test directory."""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+    @classmethod
+    def setUpClass(cls):
+        """Create the class-wide in-memory database once - no disk I/O at all."""
+        cls.tracker = TokenTracker(db_path=":memory:", fast=True)
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Close the class-wide database."""
+        cls.tracker.close()
+    
+    def setUp(self):
+        """Reset to an empty database - far cheaper than rebuilding the schema."""
+        with self.tracker._transaction() as cursor:
+            cursor.execute("DELETE FROM usage_log")
+            cursor.execute("DELETE FROM budget")
+            cursor.execute("DELETE FROM agents")
+
+
+@patch("tokentracker.datetime", _FrozenDatetime)
+class TestTokenTrackerCore(_TrackerTestBase):
+    """Test core TokenTracker functionality."""
     
     def test_initialization(self):
         """Test TokenTracker initializes correctly with database."""
-        self.assertIsNotNone(self.tracker)
-        self.assertTrue(self.test_db.exists())
+        with tempfile.TemporaryDirectory() as test_dir:
+            test_db = Path(test_dir) / "test_tokens.db"
+            tracker = TokenTracker(db_path=test_db, fast=True)
+            tracker.close()
+            
+            self.assertTrue(test_db.exists())
     
     def test_initialization_creates_tables(self):
         """Test database tables are created on initialization."""
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        
         # Check tables exist
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        cursor = self.tracker._conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
         tables = [row[0] for row in cursor.fetchall()]
         
         self.assertIn("usage_log", tables)
         self.assertIn("budget", tables)
         self.assertIn("agents", tables)
+    
+    def test_summary_query_uses_covering_index(self):
+        """Test period-filtered summaries are answered from the covering index."""
+        plan = self.tracker._conn.execute("EXPLAIN QUERY PLAN " + TokenTracker._SQL_SUMMARY, (0,)).fetchall()
+        details = " ".join(row[-1] for row in plan)
+        
+        self.assertIn("USING COVERING INDEX idx_usage_epoch_cover", details)
+    
+    def test_analyzed_summary_query_keeps_covering_index(self):
+        """Test planner statistics from a populated table still favour the covering index."""
+        rows = [("ATLAS", "sonnet-4.5", 1000, 500, None, "x" * 200)] * TokenTracker.ANALYZE_ROW_THRESHOLD
+        self.tracker.log_usage_many(rows)
+        self.tracker._analyze()
         
+        # epoch >= 0 matches every row - the case most tempted to full-scan
+        plan = self.tracker._conn.execute("EXPLAIN QUERY PLAN " + TokenTracker._SQL_SUMMARY, (0,)).fetchall()
+        details = " ".join(row[-1] for row in plan)
+        
+        self.assertIn("USING COVERING INDEX idx_usage_epoch_cover", details)
+    
+    def test_legacy_database_gets_epoch_backfill(self):
+        """Test databases without the epoch column are migrated on open."""
+        test_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(test_dir.cleanup)
+        legacy_db = Path(test_dir.name) / "legacy_tokens.db"
+        now = FROZEN_NOW
+        conn = sqlite3.connect(legacy_db)
+        conn.execute("""
+            CREATE TABLE usage_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                model TEXT NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                total_tokens INTEGER NOT NULL,
+                cost_usd REAL NOT NULL,
+                session_id TEXT,
+                notes TEXT
+            )
+        """)
+        conn.execute(
+            "INSERT INTO usage_log (timestamp, agent, model, input_tokens, output_tokens, total_tokens, cost_usd) "
+            "VALUES (?, 'ATLAS', 'sonnet-4.5', 1000, 500, 1500, 0.0105)",
+            (now.isoformat(),)
+        )
+        conn.commit()
         conn.close()
+        
+        tracker = TokenTracker(db_path=legacy_db, fast=True)
+        self.addCleanup(tracker.close)
+        
+        epoch = tracker._fetchone("SELECT epoch FROM usage_log")[0]
+        self.assertEqual(epoch, int(now.timestamp()))
+        self.assertEqual(tracker.get_usage_summary("today")['sessions'], 1)
+    
+    def test_insert_without_epoch_gets_one(self):
+        """Test rows inserted without an epoch still show up in summaries."""
+        self.tracker._conn.execute(
+            "INSERT INTO usage_log (timestamp, agent, model, input_tokens, output_tokens, total_tokens, cost_usd) "
+            "VALUES (?, 'ATLAS', 'sonnet-4.5', 1000, 500, 1500, 0.0105)",
+            (FROZEN_NOW.isoformat(),)
+        )
+        
+        epoch = self.tracker._fetchone("SELECT epoch FROM usage_log")[0]
+        self.assertEqual(epoch, int(FROZEN_NOW.timestamp()))
+        self.assertEqual(self.tracker.get_usage_summary("today")['sessions'], 1)
+    
+    def test_bulk_insert_refreshes_planner_stats(self):
+        """Test large bulk inserts run ANALYZE so the planner sees the new rows."""
+        tracker = TokenTracker(db_path=":memory:", fast=True)
+        self.addCleanup(tracker.close)
+        self.assertFalse(tracker._has_planner_stats())
+        
+        rows = [("ATLAS", "sonnet-4.5", 1000, 500)] * TokenTracker.ANALYZE_ROW_THRESHOLD
+        tracker.log_usage_many(rows)
+        
+        self.assertTrue(tracker._has_planner_stats())
+        self.assertEqual(tracker._rows_since_analyze, 0)
+    
+    def test_open_analyzes_unanalyzed_database(self):
+        """Test opening a populated database without statistics runs ANALYZE."""
+        with tempfile.TemporaryDirectory() as test_dir:
+            test_db = Path(test_dir) / "test_tokens.db"
+            tracker = TokenTracker(db_path=test_db, fast=True)
+            tracker.log_usage("ATLAS", "sonnet-4.5", 1000, 500)
+            self.assertFalse(tracker._has_planner_stats())
+            tracker.close()
+            
+            tracker = TokenTracker(db_path=test_db, fast=True)
+            self.assertTrue(tracker._has_planner_stats())
+            tracker.close()
+    
+    def test_default_mode_uses_wal(self):
+        """Test regular on-disk databases are opened in WAL mode."""
+        with tempfile.TemporaryDirectory() as test_dir:
+            tracker = TokenTracker(db_path=Path(test_dir) / "test_tokens.db")
+            journal_mode = tracker._fetchone("PRAGMA journal_mode")[0]
+            synchronous = tracker._fetchone("PRAGMA synchronous")[0]
+            tracker.close()
+            tracker.close()  # Second close is a no-op
+        
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(synchronous, 1)  # NORMAL
+    
+    def test_fast_mode_pragmas(self):
+        """Test fast mode connections skip the on-disk journal and fsyncs."""
+        journal_mode = self.tracker._fetchone("PRAGMA journal_mode")[0]
+        synchronous = self.tracker._fetchone("PRAGMA synchronous")[0]
+        
+        self.assertEqual(journal_mode, "memory")
+        self.assertEqual(synchronous, 0)  # OFF
+    
+    def test_transaction_rolls_back_on_error(self):
+        """Test a failed write leaves no partial changes behind."""
+        with self.assertRaises(RuntimeError):
+            with self.tracker._transaction() as cursor:
+                cursor.execute("INSERT INTO agents (agent_name, model) VALUES ('ATLAS', 'sonnet-4.5')")
+                raise RuntimeError("boom")
+        
+        self.assertEqual(self.tracker._fetchone("SELECT COUNT(*) FROM agents")[0], 0)
+    
+    def test_concurrent_logging_from_threads(self):
+        """Test one tracker shared by several threads writes every row."""
+        errors = []
+        
+        def worker():
+            for _ in range(100):
+                try:
+                    self.tracker.log_usage("ATLAS", "sonnet-4.5", 1000, 500)
+                    self.tracker.get_usage_summary("today")
+                except Exception as e:
+                    errors.append(e)
+        
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(self.tracker._fetchone("SELECT COUNT(*) FROM usage_log")[0], 400)
+    
+    def test_concurrent_bulk_logging_counts_every_row(self):
+        """Test bulk inserts from several threads keep the ANALYZE row count exact."""
+        tracker = TokenTracker(db_path=":memory:", fast=True)
+        self.addCleanup(tracker.close)
+        rows = [("ATLAS", "sonnet-4.5", 1000, 500)] * 7
+        
+        def worker():
+            for _ in range(10):
+                tracker.log_usage_many(rows)
+        
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # 280 rows, below ANALYZE_ROW_THRESHOLD, so none were reset
+        self.assertEqual(tracker._rows_since_analyze, 280)
     
     def test_log_usage_basic(self):
         """Test basic token logging."""
@@ -79,6 +267,13 @@ class TestTokenTrackerCore(unittest.TestCase):
         self.assertIsInstance(log_id, int)
         self.assertGreater(log_id, 0)
     
+    def test_log_usage_reports_at_info_level(self):
+        """Test the status line goes to the tokentracker logger, not stdout."""
+        with self.assertLogs("tokentracker", "INFO") as logs:
+            self.tracker.log_usage("ATLAS", "sonnet-4.5", 50000, 15000)
+        
+        self.assertEqual(logs.output, ["INFO:tokentracker:[OK] Logged 65,000 tokens (sonnet-4.5) for ATLAS - $0.3750"])
+    
     def test_log_usage_cost_calculation(self):
         """Test that cost is calculated correctly."""
         # Log usage and verify cost in database
@@ -89,11 +284,7 @@ class TestTokenTrackerCore(unittest.TestCase):
             output_tokens=1000000  # 1M output
         )
         
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        cursor.execute("SELECT cost_usd FROM usage_log ORDER BY id DESC LIMIT 1")
-        cost = cursor.fetchone()[0]
-        conn.close()
+        cost = self.tracker._fetchone("SELECT cost_usd FROM usage_log ORDER BY id DESC LIMIT 1")[0]
         
         # Expected: (1M/1M * $3) + (1M/1M * $15) = $3 + $15 = $18
         self.assertAlmostEqual(cost, 18.0, places=2)
@@ -121,14 +312,66 @@ class TestTokenTrackerCore(unittest.TestCase):
         )
         
         # Query by session_id
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM usage_log WHERE session_id = ?", (session_id,))
-        count = cursor.fetchone()[0]
-        conn.close()
+        count = self.tracker._fetchone("SELECT COUNT(*) FROM usage_log WHERE session_id = ?", (session_id,))[0]
         
         self.assertEqual(count, 2)
     
+    def test_log_usage_many(self):
+        """Test bulk logging writes every row and rolls costs into the budget."""
+        count = self.tracker.log_usage_many([
+            ("ATLAS", "sonnet-4.5", 500000, 250000),
+            ("FORGE", "opus-4.5", 100000, 50000, "bulk_session"),
+            ("CLIO", "haiku-3.5", 10000, 5000, "bulk_session", "Bulk notes"),
+        ])
+        
+        self.assertEqual(count, 3)
+        
+        session_count = self.tracker._fetchone("SELECT COUNT(*) FROM usage_log WHERE session_id = 'bulk_session'")[0]
+        self.assertEqual(session_count, 2)
+        
+        # The whole batch shares one second-precision timestamp
+        timestamps = self.tracker._conn.execute("SELECT DISTINCT timestamp FROM usage_log").fetchall()
+        self.assertEqual(timestamps, [("2026-01-22T12:00:00",)])
+        
+        # sonnet: $1.50 + $3.75, opus: $1.50 + $3.75, haiku: $0.008 + $0.02
+        budget = self.tracker.get_budget_status()
+        self.assertAlmostEqual(budget['spent'], 10.528, places=3)
+    
+    def test_log_usage_many_spans_insert_chunks(self):
+        """Test bulk logging of more rows than fit in one multi-row INSERT."""
+        row_count = TokenTracker.INSERT_CHUNK_SIZE * 2 + 7
+        rows = [("ATLAS", "sonnet-4.5", 1000 + i, 500) for i in range(row_count)]
+        
+        self.assertEqual(self.tracker.log_usage_many(rows), row_count)
+        
+        summary = self.tracker.get_usage_summary("all")
+        self.assertEqual(summary['sessions'], row_count)
+        self.assertEqual(summary['input_tokens'], sum(row[2] for row in rows))
+    
+    def test_log_batch_file(self):
+        """Test a JSON Lines batch file loads into one bulk log call."""
+        with tempfile.TemporaryDirectory() as test_dir:
+            batch_file = Path(test_dir) / "sessions.jsonl"
+            batch_file.write_text(
+                '{"agent": "ATLAS", "model": "sonnet-4.5", "input_tokens": 10000, "output_tokens": 5000}\n'
+                '\n'
+                '{"agent": "FORGE", "model": "opus-4.5", "input_tokens": 20000, "output_tokens": 10000,'
+                ' "session_id": "s1", "notes": "Review"}\n',
+                encoding="utf-8"
+            )
+            rows = read_batch_file(batch_file)
+        
+        self.assertEqual(rows, [
+            ("ATLAS", "sonnet-4.5", 10000, 5000, None, None),
+            ("FORGE", "opus-4.5", 20000, 10000, "s1", "Review"),
+        ])
+        self.assertEqual(self.tracker.log_usage_many(rows), 2)
+    
+    def test_log_usage_many_empty(self):
+        """Test bulk logging with no rows is a no-op."""
+        self.assertEqual(self.tracker.log_usage_many([]), 0)
+        self.assertEqual(self.tracker.get_usage_summary("all")['sessions'], 0)
+    
     def test_get_usage_summary_empty(self):
         """Test usage summary with no data."""
         summary = self.tracker.get_usage_summary("today")
@@ -142,17 +385,70 @@ class TestTokenTrackerCore(unittest.TestCase):
     def test_get_usage_summary_with_data(self):
         """Test usage summary returns correct aggregated data."""
         # Log some test data
-        self.tracker.log_usage("ATLAS", "sonnet-4.5", 10000, 5000)
-        self.tracker.log_usage("FORGE", "opus-4.5", 20000, 10000)
-        self.tracker.log_usage("ATLAS", "sonnet-4.5", 15000, 8000)
+        self.tracker.log_usage_many([
+            ("ATLAS", "sonnet-4.5", 10000, 5000),
+            ("FORGE", "opus-4.5", 20000, 10000),
+            ("ATLAS", "sonnet-4.5", 15000, 8000),
+        ])
         
         summary = self.tracker.get_usage_summary("today")
         
         self.assertEqual(summary['sessions'], 3)
         self.assertEqual(summary['total_tokens'], 68000)  # 10k+5k + 20k+10k + 15k+8k
+        self.assertEqual(summary['input_tokens'], 45000)
+        self.assertEqual(summary['output_tokens'], 23000)
+        # sonnet: $0.105 + $0.165, opus: $0.30 + $0.75
+        self.assertAlmostEqual(summary['total_cost'], 1.32, places=6)
         self.assertEqual(len(summary['agents']), 2)  # ATLAS and FORGE
         self.assertEqual(len(summary['models']), 2)  # sonnet-4.5 and opus-4.5
     
+    def test_get_usage_summary_rollups_across_models(self):
+        """Test per-agent and per-model rollups when agents share models."""
+        self.tracker.log_usage_many([
+            ("ATLAS", "sonnet-4.5", 1_000_000, 0),  # $3
+            ("ATLAS", "haiku-3.5", 1_000_000, 0),   # $0.80
+            ("FORGE", "opus-4.5", 1_000_000, 0),    # $15
+            ("CLIO", "haiku-3.5", 1_000_000, 0),    # $0.80
+        ])
+        
+        summary = self.tracker.get_usage_summary("today")
+        
+        agents = {entry['agent']: entry for entry in summary['agents']}
+        models = {entry['model']: entry for entry in summary['models']}
+        self.assertEqual(agents['ATLAS']['sessions'], 2)
+        self.assertAlmostEqual(agents['ATLAS']['cost'], 3.80, places=6)
+        self.assertEqual(models['haiku-3.5']['tokens'], 2_000_000)
+        self.assertAlmostEqual(models['haiku-3.5']['cost'], 1.60, places=6)
+        
+        # Both breakdowns are ordered by cost, highest first
+        self.assertEqual([entry['agent'] for entry in summary['agents']], ["FORGE", "ATLAS", "CLIO"])
+        self.assertEqual([entry['model'] for entry in summary['models']], ["opus-4.5", "sonnet-4.5", "haiku-3.5"])
+    
+    @unittest.skipUnless(importlib.util.find_spec("pandas"), "pandas not installed")
+    def test_get_usage_dataframe(self):
+        """Test raw usage rows load into a DataFrame for pandas grouping."""
+        self.tracker.log_usage_many([
+            ("ATLAS", "sonnet-4.5", 1_000_000, 0),  # $3
+            ("ATLAS", "haiku-3.5", 1_000_000, 0),   # $0.80
+            ("FORGE", "opus-4.5", 1_000_000, 0),    # $15
+        ])
+        
+        df = self.tracker.get_usage_dataframe()
+        by_agent = df.groupby("agent")[["total_tokens", "cost_usd"]].sum()
+        
+        self.assertEqual(len(df), 3)
+        self.assertEqual(by_agent.loc["ATLAS", "total_tokens"], 2_000_000)
+        self.assertAlmostEqual(by_agent.loc["ATLAS", "cost_usd"], 3.80, places=6)
+        self.assertEqual(len(self.tracker.get_usage_dataframe(FROZEN_NOW + timedelta(seconds=1))), 0)
+    
+    def test_get_usage_dataframe_requires_pandas(self):
+        """Test the DataFrame API explains the missing optional dependency."""
+        with patch.dict(sys.modules, {"pandas": None}):
+            with self.assertRaises(ImportError) as ctx:
+                self.tracker.get_usage_dataframe()
+        
+        self.assertIn("pandas", str(ctx.exception))
+    
     def test_get_budget_status_new_month(self):
         """Test budget status for month with no data."""
         budget = self.tracker.get_budget_status()
@@ -177,15 +473,89 @@ class TestTokenTrackerCore(unittest.TestCase):
         self.assertAlmostEqual(budget['percent_used'], 15.0, places=1)
         self.assertTrue(budget['on_track'])  # Under 80%
     
+    def test_usage_counts_toward_current_month_only(self):
+        """Test budget spend is summed from the current month's usage rows."""
+        self.tracker.log_usage("ATLAS", "sonnet-4.5", 500000, 500000)
+        # Rows written without going through log_usage count too, in their own month
+        self.tracker._conn.execute(
+            "INSERT INTO usage_log (timestamp, agent, model, input_tokens, output_tokens, total_tokens, cost_usd) "
+            "VALUES ('2025-12-31T23:59:59', 'ATLAS', 'sonnet-4.5', 0, 0, 0, 1.25)"
+        )
+        
+        budget = self.tracker.get_budget_status()
+        
+        self.assertEqual(budget['month'], "2026-01")
+        self.assertAlmostEqual(budget['spent'], 9.0, places=2)
+        
+        summary = self.tracker.get_usage_summary("all")
+        self.assertEqual(summary['sessions'], 2)
+        self.assertAlmostEqual(summary['total_cost'], 10.25, places=2)
+        self.assertEqual(self.tracker.get_usage_summary("month")['sessions'], 1)
+    
+    def test_older_writer_spend_counted_once(self):
+        """Test an older copy that keeps budget.spent_usd itself is not double counted."""
+        # What a pre-epoch TokenTracker writes: the usage row plus its own upsert
+        with self.tracker._transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO usage_log (timestamp, agent, model, input_tokens, output_tokens, total_tokens, cost_usd) "
+                "VALUES (?, 'ATLAS', 'sonnet-4.5', 0, 0, 0, 3.0)",
+                (FROZEN_NOW.isoformat(),)
+            )
+            cursor.execute(
+                "INSERT INTO budget (month, budget_usd, spent_usd) VALUES ('2026-01', 60.0, 3.0) "
+                "ON CONFLICT(month) DO UPDATE SET spent_usd = spent_usd + 3.0"
+            )
+        
+        self.assertAlmostEqual(self.tracker.get_budget_status()['spent'], 3.0, places=2)
+    
+    def test_old_rollup_trigger_dropped_on_open(self):
+        """Test databases carrying the old budget rollup trigger lose it on open."""
+        with tempfile.TemporaryDirectory() as test_dir:
+            test_db = Path(test_dir) / "test_tokens.db"
+            TokenTracker(db_path=test_db, fast=True).close()
+            conn = sqlite3.connect(test_db)
+            conn.execute("""
+                CREATE TRIGGER trg_budget_rollup AFTER INSERT ON usage_log
+                BEGIN
+                    INSERT INTO budget (month, budget_usd, spent_usd)
+                    VALUES (substr(NEW.timestamp, 1, 7), 60.0, NEW.cost_usd)
+                    ON CONFLICT(month) DO UPDATE SET spent_usd = spent_usd + NEW.cost_usd;
+                END
+            """)
+            conn.commit()
+            conn.close()
+            
+            tracker = TokenTracker(db_path=test_db, fast=True)
+            trigger = tracker._fetchone("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_budget_rollup'")
+            tracker.close()
+        
+        self.assertIsNone(trigger)
+    
+    def test_default_budget_read_from_class(self):
+        """Test months without a set budget use the tracker class's DEFAULT_BUDGET."""
+        class CustomTracker(TokenTracker):
+            DEFAULT_BUDGET = 120.0
+        
+        tracker = CustomTracker(db_path=":memory:", fast=True)
+        self.addCleanup(tracker.close)
+        tracker.log_usage("ATLAS", "sonnet-4.5", 500000, 500000)
+        
+        budget = tracker.get_budget_status()
+        self.assertEqual(budget['budget'], 120.0)
+        self.assertAlmostEqual(budget['remaining'], 111.0, places=2)
+    
+    def test_month_spend_query_uses_covering_index(self):
+        """Test budget spend is answered from the covering index."""
+        plan = self.tracker._conn.execute("EXPLAIN QUERY PLAN " + TokenTracker._SQL_MONTH_SPEND, (0, 1)).fetchall()
+        details = " ".join(row[-1] for row in plan)
+        
+        self.assertIn("USING COVERING INDEX idx_usage_epoch_cover", details)
+    
     def test_set_budget(self):
         """Test setting budget for a month."""
         self.tracker.set_budget("2026-01", 75.0)
         
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        cursor.execute("SELECT budget_usd FROM budget WHERE month = '2026-01'")
-        budget = cursor.fetchone()[0]
-        conn.close()
+        budget = self.tracker._fetchone("SELECT budget_usd FROM budget WHERE month = '2026-01'")[0]
         
         self.assertEqual(budget, 75.0)
     
@@ -200,11 +570,38 @@ class TestTokenTrackerCore(unittest.TestCase):
         self.assertIn('"generated_at":', report)
         
         # Should be valid JSON
-        import json
         data = json.loads(report)
         self.assertIn('usage', data)
         self.assertIn('budget', data)
     
+    def test_export_report_json_compact_and_pretty(self):
+        """Test JSON reports are compact by default and indented on request."""
+        self.tracker.log_usage("ATLAS", "sonnet-4.5", 10000, 5000)
+        
+        compact = self.tracker.export_report("today", "json")
+        pretty = self.tracker.export_report("today", "json", pretty=True)
+        
+        self.assertNotIn("\n", compact)
+        self.assertIn('\n  "usage": {', pretty)
+        self.assertEqual(json.loads(compact), json.loads(pretty))
+    
+    def test_export_report_json_without_orjson(self):
+        """Test JSON reports fall back to the stdlib encoder."""
+        self.tracker.log_usage("ATLAS", "sonnet-4.5", 10000, 5000)
+        
+        _json_dumps.cache_clear()
+        try:
+            with patch.dict(sys.modules, {"orjson": None}):
+                compact = self.tracker.export_report("today", "json")
+                pretty = self.tracker.export_report("today", "json", pretty=True)
+        finally:
+            _json_dumps.cache_clear()
+        
+        self.assertNotIn("\n", compact)
+        self.assertNotIn(", ", compact)
+        self.assertIn('\n  "usage": {', pretty)
+        self.assertEqual(json.loads(compact)["usage"]["sessions"], 1)
+    
     def test_export_report_text(self):
         """Test text report export."""
         self.tracker.log_usage("ATLAS", "sonnet-4.5", 10000, 5000, notes="Test")
@@ -216,19 +613,10 @@ class TestTokenTrackerCore(unittest.TestCase):
         self.assertIn("USAGE SUMMARY:", report)
 
 
-class TestTokenTrackerValidation(unittest.TestCase):
+@patch("tokentracker.datetime", _FrozenDatetime)
+class TestTokenTrackerValidation(_TrackerTestBase):
     """Test input validation and error handling."""
     
-    def setUp(self):
-        """Set up test fixtures with isolated database."""
-        self.test_dir = tempfile.mkdtemp()
-        self.test_db = Path(self.test_dir) / "test_tokens.db"
-        self.tracker = TokenTracker(db_path=self.test_db)
-    
-    def tearDown(self):
-        """Clean up test directory."""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
-    
     def test_validate_agent_empty(self):
         """Test validation rejects empty agent name."""
         with self.assertRaises(ValueError) as context:
@@ -249,7 +637,9 @@ class TestTokenTrackerValidation(unittest.TestCase):
             "ATLAS; DROP TABLE usage_log;--",
             "FORGE /* evil */",
             "DELETE FROM budget",
-            "INSERT INTO agents"
+            "INSERT INTO agents",
+            "drop table usage_log",
+            "Update budget"
         ]
         
         for name in malicious_names:
@@ -257,6 +647,13 @@ class TestTokenTrackerValidation(unittest.TestCase):
                 self.tracker.log_usage(name, "sonnet-4.5", 1000, 500)
             self.assertIn("invalid", str(context.exception).lower())
     
+    def test_validate_agent_keyword_inside_word_allowed(self):
+        """Test SQL keywords only count as whole words."""
+        for name in ["BACKDROP", "UPDATER", "INSERTION_BOT"]:
+            with self.assertLogs("tokentracker", "WARNING"):  # Unknown agent
+                log_id = self.tracker.log_usage(name, "sonnet-4.5", 1000, 500)
+            self.assertIsNotNone(log_id)
+    
     def test_validate_model_empty(self):
         """Test validation rejects empty model name."""
         with self.assertRaises(ValueError) as context:
@@ -285,6 +682,88 @@ class TestTokenTrackerValidation(unittest.TestCase):
         
         self.assertIn("maximum", str(context.exception).lower())
     
+    def test_log_usage_many_invalid_row_logs_nothing(self):
+        """Test one invalid row rejects the whole batch."""
+        with self.assertRaises(ValueError):
+            self.tracker.log_usage_many([
+                ("ATLAS", "sonnet-4.5", 1000, 500),
+                ("ATLAS", "sonnet-4.5", -1000, 500),
+            ])
+        
+        self.assertEqual(self.tracker.get_usage_summary("all")['sessions'], 0)
+    
+    def test_log_usage_many_wrong_row_length(self):
+        """Test bulk logging rejects rows with missing fields."""
+        with self.assertRaises(ValueError):
+            self.tracker.log_usage_many([("ATLAS", "sonnet-4.5", 1000)])
+    
+    def test_log_usage_many_non_string_names(self):
+        """Test bulk logging rejects non-string names with ValueError, not TypeError."""
+        for row in ((["ATLAS"], "sonnet-4.5", 1000, 500), ("ATLAS", {"sonnet": 4.5}, 1000, 500)):
+            with self.subTest(row=row):
+                with self.assertRaises(ValueError) as context:
+                    self.tracker.log_usage_many([row])
+                
+                self.assertIn("must be a string", str(context.exception))
+    
+    def test_log_batch_file_missing_key(self):
+        """Test batch files report the line of an incomplete entry."""
+        with tempfile.TemporaryDirectory() as test_dir:
+            batch_file = Path(test_dir) / "sessions.jsonl"
+            batch_file.write_text('{"agent": "ATLAS", "model": "sonnet-4.5"}\n', encoding="utf-8")
+            
+            with self.assertRaises(ValueError) as context:
+                read_batch_file(batch_file)
+        
+        self.assertIn("sessions.jsonl:1", str(context.exception))
+    
+    def test_log_batch_file_wrong_types(self):
+        """Test batch file entries with wrong field types are rejected by log_usage_many."""
+        cases = [
+            ('"input_tokens": "100", "output_tokens": 50', "Input tokens must be an integer"),
+            ('"input_tokens": 1.5, "output_tokens": 50', "Input tokens must be an integer"),
+            ('"input_tokens": 100, "output_tokens": true', "Output tokens must be an integer"),
+            ('"input_tokens": 100, "output_tokens": 50, "agent": 5', "Agent name must be a string"),
+            ('"input_tokens": 100, "output_tokens": 50, "session_id": 7', "Session ID must be a string"),
+            ('"input_tokens": 100, "output_tokens": 50, "notes": ["x"]', "Notes must be a string"),
+        ]
+        with tempfile.TemporaryDirectory() as test_dir:
+            batch_file = Path(test_dir) / "sessions.jsonl"
+            for fields, message in cases:
+                with self.subTest(fields=fields):
+                    batch_file.write_text(
+                        '{"agent": "ATLAS", "model": "sonnet-4.5", "input_tokens": 1, "output_tokens": 1}\n'
+                        '\n{"agent": "ATLAS", "model": "sonnet-4.5", ' + fields + '}\n', encoding="utf-8"
+                    )
+                    rows = read_batch_file(batch_file)
+                    with self.assertRaises(ValueError) as context:
+                        self.tracker.log_usage_many(rows)
+                    
+                    self.assertIn("Row 2:", str(context.exception))
+                    self.assertIn(message, str(context.exception))
+        
+        self.assertEqual(self.tracker.get_usage_summary("all")['sessions'], 0)
+    
+    def test_wrong_field_types_raise_value_error(self):
+        """Test Python callers get ValueError, not TypeError or stored floats, for bad types."""
+        cases = [
+            (("ATLAS", "sonnet-4.5", "100", 5), "Input tokens must be an integer"),
+            (("ATLAS", "sonnet-4.5", 100, 1.5), "Output tokens must be an integer"),
+            (("ATLAS", "sonnet-4.5", 100, 5, {"id": 1}), "Session ID must be a string"),
+            (("ATLAS", "sonnet-4.5", 100, 5, None, 123), "Notes must be a string"),
+        ]
+        for row, message in cases:
+            with self.subTest(row=row):
+                with self.assertRaises(ValueError) as context:
+                    self.tracker.log_usage(*row)
+                self.assertIn(message, str(context.exception))
+                
+                with self.assertRaises(ValueError) as context:
+                    self.tracker.log_usage_many([row])
+                self.assertIn(message, str(context.exception))
+        
+        self.assertEqual(self.tracker.get_usage_summary("all")['sessions'], 0)
+    
     def test_validate_month_format_invalid(self):
         """Test validation rejects invalid month format."""
         invalid_months = [
@@ -293,13 +772,26 @@ class TestTokenTrackerValidation(unittest.TestCase):
             "01-2026",
             "26-01",
             "2026-1",  # Single digit month
-            "2026-13"  # Invalid month
+            "2026-13",  # Invalid month
+            "2026-01\n",  # Trailing newline
         ]
         
         for month in invalid_months:
             with self.assertRaises(ValueError):
                 self.tracker.set_budget(month, 60.0)
     
+    def test_validate_month_cached(self):
+        """Test a valid month is parsed once and invalid months keep failing."""
+        self.tracker._validate_month("2026-03")
+        hits_before = TokenTracker._validate_month.cache_info().hits
+        
+        self.assertEqual(self.tracker._validate_month("2026-03"), "2026-03")
+        self.assertEqual(TokenTracker._validate_month.cache_info().hits, hits_before + 1)
+        
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                self.tracker._validate_month("2026-13")
+    
     def test_validate_budget_negative(self):
         """Test validation rejects negative budget."""
         with self.assertRaises(ValueError) as context:
@@ -315,19 +807,10 @@ class TestTokenTrackerValidation(unittest.TestCase):
         self.assertIn("limit", str(context.exception).lower())
 
 
-class TestTokenTrackerEdgeCases(unittest.TestCase):
+@patch("tokentracker.datetime", _FrozenDatetime)
+class TestTokenTrackerEdgeCases(_TrackerTestBase):
     """Test edge cases and boundary conditions."""
     
-    def setUp(self):
-        """Set up test fixtures with isolated database."""
-        self.test_dir = tempfile.mkdtemp()
-        self.test_db = Path(self.test_dir) / "test_tokens.db"
-        self.tracker = TokenTracker(db_path=self.test_db)
-    
-    def tearDown(self):
-        """Clean up test directory."""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
-    
     def test_zero_tokens(self):
         """Test logging zero tokens works."""
         log_id = self.tracker.log_usage("ATLAS", "sonnet-4.5", 0, 0)
@@ -335,36 +818,52 @@ class TestTokenTrackerEdgeCases(unittest.TestCase):
     
     def test_unknown_agent_warning(self):
         """Test unknown agent generates warning but still logs."""
-        # Should log but print warning
-        log_id = self.tracker.log_usage("UNKNOWN_AGENT", "sonnet-4.5", 1000, 500)
+        with self.assertLogs("tokentracker", "WARNING") as logs:
+            log_id = self.tracker.log_usage("UNKNOWN_AGENT", "sonnet-4.5", 1000, 500)
+        
         self.assertIsNotNone(log_id)
+        self.assertIn("Unknown agent: UNKNOWN_AGENT", logs.output[0])
+    
+    def test_log_usage_many_validates_each_name_once(self):
+        """Test bulk logging validates (and warns about) each distinct name once."""
+        with self.assertLogs("tokentracker", "WARNING") as logs:
+            self.tracker.log_usage_many([("newbie", "mystery-model", 1000, i) for i in range(3)])
+        
+        self.assertEqual(logs.output, [
+            "WARNING:tokentracker:[WARNING] Unknown agent: NEWBIE (will be logged anyway)",
+            "WARNING:tokentracker:[WARNING] Unknown model: mystery-model, using default sonnet-4.5 pricing",
+        ])
+        rows = self.tracker._conn.execute("SELECT DISTINCT agent, model FROM usage_log").fetchall()
+        self.assertEqual(rows, [("NEWBIE", "mystery-model")])
     
     def test_unknown_model_warning(self):
         """Test unknown model generates warning but still logs."""
-        # Should log but print warning and use default pricing
-        log_id = self.tracker.log_usage("ATLAS", "unknown-model", 1000, 500)
+        # Should log but warn and use default pricing
+        with self.assertLogs("tokentracker", "WARNING") as logs:
+            log_id = self.tracker.log_usage("ATLAS", "unknown-model", 1000, 500)
+        
         self.assertIsNotNone(log_id)
+        self.assertIn("Unknown model: unknown-model", logs.output[0])
     
     def test_long_notes_truncation(self):
         """Test very long notes are truncated."""
         long_notes = "x" * 2000  # 2000 characters
-        log_id = self.tracker.log_usage("ATLAS", "sonnet-4.5", 1000, 500, notes=long_notes)
+        with self.assertLogs("tokentracker", "WARNING"):
+            log_id = self.tracker.log_usage("ATLAS", "sonnet-4.5", 1000, 500, notes=long_notes)
         
         # Verify notes were truncated in database
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        cursor.execute("SELECT notes FROM usage_log WHERE id = ?", (log_id,))
-        stored_notes = cursor.fetchone()[0]
-        conn.close()
+        stored_notes = self.tracker._fetchone("SELECT notes FROM usage_log WHERE id = ?", (log_id,))[0]
         
         self.assertLessEqual(len(stored_notes), 1000)
         self.assertTrue(stored_notes.endswith("..."))
     
     def test_agent_name_normalization(self):
         """Test agent names are normalized to uppercase."""
-        self.tracker.log_usage("atlas", "sonnet-4.5", 1000, 500)
-        self.tracker.log_usage("Atlas", "sonnet-4.5", 1000, 500)
-        self.tracker.log_usage("ATLAS", "sonnet-4.5", 1000, 500)
+        self.tracker.log_usage_many([
+            ("atlas", "sonnet-4.5", 1000, 500),
+            ("Atlas", "sonnet-4.5", 1000, 500),
+            ("ATLAS", "sonnet-4.5", 1000, 500),
+        ])
         
         summary = self.tracker.get_usage_summary("today")
         
@@ -375,9 +874,11 @@ class TestTokenTrackerEdgeCases(unittest.TestCase):
     
     def test_model_name_normalization(self):
         """Test model names are normalized to lowercase."""
-        self.tracker.log_usage("ATLAS", "SONNET-4.5", 1000, 500)
-        self.tracker.log_usage("ATLAS", "Sonnet-4.5", 1000, 500)
-        self.tracker.log_usage("ATLAS", "sonnet-4.5", 1000, 500)
+        self.tracker.log_usage_many([
+            ("ATLAS", "SONNET-4.5", 1000, 500),
+            ("ATLAS", "Sonnet-4.5", 1000, 500),
+            ("ATLAS", "sonnet-4.5", 1000, 500),
+        ])
         
         summary = self.tracker.get_usage_summary("today")
         
@@ -387,21 +888,19 @@ class TestTokenTrackerEdgeCases(unittest.TestCase):
     
     def test_free_tier_models_cost(self):
         """Test free tier models (grok, gemini) have zero cost."""
-        self.tracker.log_usage("BOLT", "grok", 1000000, 500000)
-        self.tracker.log_usage("GEMINI", "gemini", 1000000, 500000)
+        self.tracker.log_usage_many([
+            ("BOLT", "grok", 1000000, 500000),
+            ("GEMINI", "gemini", 1000000, 500000),
+        ])
         
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        cursor.execute("SELECT SUM(cost_usd) FROM usage_log")
-        total_cost = cursor.fetchone()[0]
-        conn.close()
+        total_cost = self.tracker._fetchone("SELECT SUM(cost_usd) FROM usage_log")[0]
         
         self.assertEqual(total_cost, 0.0)
     
     def test_budget_over_threshold_flag(self):
         """Test on_track flag changes when over 80% budget."""
         # Set small budget for easier testing
-        self.tracker.set_budget(datetime.now().strftime("%Y-%m"), 10.0)
+        self.tracker.set_budget(FROZEN_NOW.strftime("%Y-%m"), 10.0)
         
         # Spend $9 (90% of budget)
         # sonnet-4.5: Need to calculate tokens for ~$9
@@ -427,65 +926,199 @@ class TestTokenTrackerEdgeCases(unittest.TestCase):
         self.assertEqual(week['sessions'], 1)
         self.assertEqual(month['sessions'], 1)
         self.assertEqual(all_time['sessions'], 1)
+    
+    def test_all_period_has_no_lower_bound(self):
+        """Test "all" includes entries dated before its nominal 2020 start."""
+        self.tracker._conn.execute(
+            "INSERT INTO usage_log (timestamp, agent, model, input_tokens, output_tokens, total_tokens, cost_usd, epoch) "
+            "VALUES ('2019-06-01T12:00:00', 'ATLAS', 'sonnet-4.5', 100, 0, 100, 0.0003, ?)",
+            (int(datetime(2019, 6, 1, 12).timestamp()),)
+        )
+        
+        self.assertEqual(self.tracker.get_usage_summary("all")['sessions'], 1)
+        self.assertEqual(self.tracker.get_usage_summary("month")['sessions'], 0)
+    
+    def test_period_bounds(self):
+        """Test each period starts at the expected midnight and is cached per day."""
+        expected = {
+            "today": "2026-01-22T00:00:00",
+            "week": "2026-01-15T00:00:00",
+            "month": "2026-01-01T00:00:00",
+            "all": "2020-01-01T00:00:00",
+        }
+        for period, start in expected.items():
+            with self.subTest(period=period):
+                self.assertEqual(self.tracker.get_usage_summary(period)['start_date'], start)
+        
+        hits_before = _period_bounds.cache_info().hits
+        self.tracker.get_usage_summary("week")
+        self.assertEqual(_period_bounds.cache_info().hits, hits_before + 1)
 
 
-class TestTokenTrackerCostCalculation(unittest.TestCase):
+class TestTokenTrackerCostCalculation(_TrackerTestBase):
     """Test cost calculation accuracy for different models."""
     
+    # (model, input_tokens, output_tokens, expected_cost_usd)
+    COST_CASES = [
+        ("opus-4.5", 1_000_000, 1_000_000, 90.0),    # $15 + $75
+        ("sonnet-4.5", 1_000_000, 1_000_000, 18.0),  # $3 + $15
+        ("haiku-3.5", 1_000_000, 1_000_000, 4.80),   # $0.80 + $4
+        ("grok", 1_000_000, 1_000_000, 0.0),         # Free tier
+        ("gemini", 1_000_000, 1_000_000, 0.0),       # Extension, free
+        ("sonnet-4.5", 500_000, 500_000, 9.0),       # Partial million: $1.50 + $7.50
+        ("sonnet-4.5", 10_000, 5_000, 0.105),        # Small counts: $0.03 + $0.075
+    ]
+    
+    def test_cost_table(self):
+        """Test cost calculation for each model against known pricing."""
+        for model, input_tokens, output_tokens, expected in self.COST_CASES:
+            with self.subTest(model=model, input_tokens=input_tokens, output_tokens=output_tokens):
+                cost = self.tracker._calculate_cost(model, input_tokens, output_tokens)
+                self.assertAlmostEqual(cost, expected, places=3)
+    
+    def test_cost_cache_reuses_results(self):
+        """Test repeated (model, input, output) triples are served from the cache."""
+        self.tracker._calculate_cost("sonnet-4.5", 12345, 678)
+        hits_before = _calculate_cost_cached.cache_info().hits
+        
+        cost = self.tracker._calculate_cost("sonnet-4.5", 12345, 678)
+        
+        self.assertEqual(_calculate_cost_cached.cache_info().hits, hits_before + 1)
+        self.assertAlmostEqual(cost, 0.047205, places=6)
+    
+    def test_cost_uses_subclass_pricing(self):
+        """Test a subclass overriding TOKEN_COSTS is priced from it without warnings."""
+        class CustomTracker(TokenTracker):
+            TOKEN_COSTS = {
+                **TokenTracker.TOKEN_COSTS,
+                "opus-4.5": {"input": 5.00, "output": 25.00},
+                "new-model": {"input": 1.00, "output": 1.00},
+            }
+        
+        tracker = CustomTracker(db_path=":memory:", fast=True)
+        self.addCleanup(tracker.close)
+        
+        with patch("tokentracker.log.warning") as warning:
+            model = tracker._validate_model("new-model")
+        warning.assert_not_called()
+        self.assertAlmostEqual(tracker._calculate_cost("opus-4.5", 1_000_000, 1_000_000), 30.0, places=6)
+        self.assertAlmostEqual(tracker._calculate_cost(model, 1_000_000, 1_000_000), 2.0, places=6)
+        # Unknown models still fall back to sonnet-4.5 pricing
+        self.assertAlmostEqual(tracker._calculate_cost("unknown", 1_000_000, 1_000_000), 18.0, places=6)
+        # The base class keeps its own prices
+        self.assertAlmostEqual(self.tracker._calculate_cost("opus-4.5", 1_000_000, 1_000_000), 90.0, places=6)
+    
+    def test_subclass_agents_are_known(self):
+        """Test a subclass overriding AGENTS does not warn about its own agents."""
+        class CustomTracker(TokenTracker):
+            AGENTS = {**TokenTracker.AGENTS, "ORBIT": "Custom Agent"}
+        
+        with patch("tokentracker.log.warning") as warning:
+            self.assertEqual(CustomTracker._validate_agent("orbit"), "ORBIT")
+        warning.assert_not_called()
+
+
+class TestTokenTrackerCLI(unittest.TestCase):
+    """Test the command-line interface against a throwaway database."""
+    
     def setUp(self):
-        """Set up test fixtures with isolated database."""
-        self.test_dir = tempfile.mkdtemp()
-        self.test_db = Path(self.test_dir) / "test_tokens.db"
-        self.tracker = TokenTracker(db_path=self.test_db)
-    
-    def tearDown(self):
-        """Clean up test directory."""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
-    
-    def test_opus_cost_calculation(self):
-        """Test Opus 4.5 cost calculation ($15/$75 per 1M)."""
-        cost = self.tracker._calculate_cost("opus-4.5", 1000000, 1000000)
-        # (1M/1M * $15) + (1M/1M * $75) = $15 + $75 = $90
-        self.assertAlmostEqual(cost, 90.0, places=2)
-    
-    def test_sonnet_cost_calculation(self):
-        """Test Sonnet 4.5 cost calculation ($3/$15 per 1M)."""
-        cost = self.tracker._calculate_cost("sonnet-4.5", 1000000, 1000000)
-        # (1M/1M * $3) + (1M/1M * $15) = $3 + $15 = $18
-        self.assertAlmostEqual(cost, 18.0, places=2)
+        """Point the CLI's default database at a temporary directory."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.db_path = Path(temp_dir.name) / "token_usage.db"
+        
+        for target, value in (("tokentracker._DEFAULT_DB_PATH", self.db_path),
+                              ("tokentracker.logging.basicConfig", lambda **kwargs: None)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def run_cli(self, *argv):
+        """Run main() and return (exit status, captured stdout)."""
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            status = main(list(argv))
+        return status, out.getvalue()
+    
+    def test_no_arguments_prints_usage(self):
+        """Test running without a command shows the usage text."""
+        status, output = self.run_cli()
+        
+        self.assertEqual(status, 1)
+        self.assertIn("USAGE:", output)
+        self.assertFalse(self.db_path.exists())
     
-    def test_haiku_cost_calculation(self):
-        """Test Haiku 3.5 cost calculation ($0.80/$4 per 1M)."""
-        cost = self.tracker._calculate_cost("haiku-3.5", 1000000, 1000000)
-        # (1M/1M * $0.80) + (1M/1M * $4) = $0.80 + $4 = $4.80
-        self.assertAlmostEqual(cost, 4.80, places=2)
-    
-    def test_grok_cost_calculation(self):
-        """Test Grok cost calculation (free tier)."""
-        cost = self.tracker._calculate_cost("grok", 1000000, 1000000)
-        self.assertEqual(cost, 0.0)
-    
-    def test_gemini_cost_calculation(self):
-        """Test Gemini cost calculation (extension, free)."""
-        cost = self.tracker._calculate_cost("gemini", 1000000, 1000000)
-        self.assertEqual(cost, 0.0)
-    
-    def test_partial_million_tokens(self):
-        """Test cost calculation for partial million tokens."""
-        # 500k input, 500k output for sonnet-4.5
-        cost = self.tracker._calculate_cost("sonnet-4.5", 500000, 500000)
-        # (500k/1M * $3) + (500k/1M * $15) = $1.50 + $7.50 = $9.00
-        self.assertAlmostEqual(cost, 9.0, places=2)
-    
-    def test_small_token_counts(self):
-        """Test cost calculation for small token counts."""
-        # 10k input, 5k output for sonnet-4.5
-        cost = self.tracker._calculate_cost("sonnet-4.5", 10000, 5000)
-        # (10k/1M * $3) + (5k/1M * $15) = $0.03 + $0.075 = $0.105
-        self.assertAlmostEqual(cost, 0.105, places=3)
+    def test_log_command(self):
+        """Test the log command, including case-insensitive names and multi-word notes."""
+        status, _ = self.run_cli("LOG", "atlas", "sonnet-4.5", "1000", "500", "Built", "TokenTracker")
+        
+        self.assertEqual(status, 0)
+        tracker = TokenTracker(db_path=self.db_path)
+        self.addCleanup(tracker.close)
+        self.assertEqual(
+            tracker._fetchone("SELECT agent, total_tokens, notes FROM usage_log"),
+            ("ATLAS", 1500, "Built TokenTracker")
+        )
+    
+    def test_set_budget_command_validates_once(self):
+        """Test set-budget stores the amount and checks it only once."""
+        with patch.object(TokenTracker, "_validate_budget", wraps=TokenTracker._validate_budget) as validate:
+            status, _ = self.run_cli("set-budget", "2026-02", "75")
+        
+        self.assertEqual(status, 0)
+        self.assertEqual(validate.call_count, 1)
+        tracker = TokenTracker(db_path=self.db_path)
+        self.addCleanup(tracker.close)
+        self.assertEqual(tracker._fetchone("SELECT budget_usd FROM budget WHERE month = '2026-02'"), (75.0,))
+    
+    def test_invalid_value_reports_error(self):
+        """Test validation errors print an [ERROR] line and exit with status 1."""
+        cases = [
+            (("set-budget", "2026-13", "60"), "[ERROR] Invalid month format: 2026-13"),
+            (("set-budget", "2026-01", "-5"), "[ERROR] Budget cannot be negative"),
+            (("log", "ATLAS;", "sonnet-4.5", "1", "2"), "[ERROR] Invalid characters in agent name"),
+            (("log", "ATLAS", " ", "1", "2"), "[ERROR] Model name cannot be empty"),
+            (("log", "ATLAS", "sonnet-4.5", "-1", "2"), "[ERROR] Input tokens cannot be negative"),
+        ]
+        for argv, message in cases:
+            with self.subTest(argv=argv):
+                status, output = self.run_cli(*argv)
+                
+                self.assertEqual(status, 1)
+                self.assertIn(message, output)
+                self.assertFalse(self.db_path.exists())
+    
+    def test_bad_batch_file_does_not_open_database(self):
+        """Test a missing batch file fails before the database is created."""
+        status, output = self.run_cli("log-batch", str(self.db_path.with_name("missing.jsonl")))
+        
+        self.assertEqual(status, 1)
+        self.assertIn("[ERROR]", output)
+        self.assertFalse(self.db_path.exists())
+    
+    def test_bad_arguments_exit_with_usage(self):
+        """Test argparse rejects unknown commands and malformed arguments."""
+        for argv in (["foo"], ["log", "ATLAS", "sonnet-4.5", "many", "500"], ["summary", "year"]):
+            with self.subTest(argv=argv):
+                with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit) as ctx:
+                    self.run_cli(*argv)
+                self.assertEqual(ctx.exception.code, 2)
+        
+        self.assertFalse(self.db_path.exists())
 
 
 def run_tests():
+    """Run all tests, in parallel when pytest-xdist is installed."""
+    # find_spec rather than import: importing xdist here would stop pytest
+    # from assertion-rewriting it
+    if importlib.util.find_spec("pytest") is None or importlib.util.find_spec("xdist") is None:
+        return run_tests_serial()
+    
+    import pytest
+    return pytest.main(["-n", "auto", "-q", __file__])
+
+
+def run_tests_serial():
     """Run all tests with nice output."""
     print("=" * 70)
     print("TESTING: TokenTracker v1.0")
@@ -501,6 +1134,7 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestTokenTrackerValidation))
     suite.addTests(loader.loadTestsFromTestCase(TestTokenTrackerEdgeCases))
     suite.addTests(loader.loadTestsFromTestCase(TestTokenTrackerCostCalculation))
+    suite.addTests(loader.loadTestsFromTestCase(TestTokenTrackerCLI))
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
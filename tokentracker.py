@@ -9,16 +9,48 @@ Author: Team Brain (Atlas)
 License: MIT
 """
 
-import json
+import functools
+import logging
+import re
 import sqlite3
 import sys
-import os
-from datetime import datetime, timedelta
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 __version__ = "1.0.0"
 
+# Status and warning messages. Silent below WARNING unless the application
+# configures logging (the CLI does, in main()).
+log = logging.getLogger("tokentracker")
+
+# Default database location: alongside this script (resolved once at import)
+_DEFAULT_DB_PATH = Path(__file__).resolve().parent / "token_usage.db"
+
+# Nominal start_date reported for period="all"
+_ALL_START_DATE = "2020-01-01T00:00:00"
+
+# Rule line framing the text report
+_RULE = "=" * 60
+
+# Compiled once at import; validators run on every log_usage call.
+# \Z rather than $, which would also accept a trailing newline.
+_MONTH_RE = re.compile(r'^(\d{4})-(\d{2})\Z', re.ASCII)
+# Basic SQL injection prevention: statement separators, comments and
+# data-changing keywords as whole words in any case (so "drop table" is
+# caught but a name like "BACKDROP" is not)
+_INJECTION_RE = re.compile(r';|--|/\*|\*/|\b(?:DROP|DELETE|INSERT|UPDATE)\b', re.IGNORECASE)
+
+
+def _build_cost_table(token_costs: Dict[str, Dict[str, float]]) -> Dict[str, Tuple[float, float]]:
+    """Flatten TOKEN_COSTS (USD per 1M tokens) into (input, output) USD per token."""
+    return {
+        model: (pricing["input"] / 1_000_000, pricing["output"] / 1_000_000)
+        for model, pricing in token_costs.items()
+    }
+
 
 class TokenTracker:
     """Token usage tracking and budget management for Team Brain."""
@@ -48,52 +80,212 @@ class TokenTracker:
         "gemini": {"input": 0.00, "output": 0.00}  # Using extension
     }
     
-    def __init__(self, db_path: Optional[Path] = None):
+    # (input, output) USD per single token, flattened and pre-divided once
+    # so a cost is just two multiplies
+    _COST_TABLE = _build_cost_table(TOKEN_COSTS)
+    
+    # Membership sets for the validators on the log_usage hot path
+    AGENTS_SET = frozenset(AGENTS)
+    MODELS_SET = frozenset(TOKEN_COSTS)
+    
+    # PRAGMAs for regular databases, applied once per connection. WAL lets
+    # readers run alongside a writer and, with synchronous=NORMAL, only
+    # syncs at checkpoints - still crash-safe, though a power loss can drop
+    # the last few commits. cache_size is in KiB when negative (~20 MB).
+    DEFAULT_PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-20000",
+    )
+    
+    # PRAGMAs applied when fast=True: no journal on disk and no fsyncs.
+    # Only safe for throwaway databases (tests, scratch runs) - a crash
+    # mid-write can corrupt the file.
+    FAST_PRAGMAS = (
+        "PRAGMA journal_mode=MEMORY",
+        "PRAGMA synchronous=OFF",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA locking_mode=EXCLUSIVE",
+    )
+    
+    # Rows per multi-row INSERT in log_usage_many. 50 rows x 10 columns stays
+    # under SQLite's historical 999 bound-parameter limit.
+    INSERT_CHUNK_SIZE = 50
+    
+    # log_usage_many refreshes planner statistics once this many rows have
+    # been bulk-inserted since the last ANALYZE
+    ANALYZE_ROW_THRESHOLD = 1000
+    
+    # Hot-path SQL, kept as fixed strings so sqlite3's per-connection
+    # statement cache (keyed on the SQL text) prepares each one only once
+    _SQL_INSERT_LOG = """
+        INSERT INTO usage_log 
+        (timestamp, agent, model, input_tokens, output_tokens, total_tokens, cost_usd, session_id, notes, epoch)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    # One scan per summary: per-agent, per-model and overall totals are all
+    # rolled up in Python from the (few) agent x model groups
+    _SQL_SUMMARY = """
+        SELECT 
+            agent,
+            model,
+            COUNT(*) as sessions,
+            SUM(input_tokens) as total_input,
+            SUM(output_tokens) as total_output,
+            SUM(total_tokens) as total_tokens,
+            SUM(cost_usd) as total_cost
+        FROM usage_log
+        WHERE epoch >= ?
+        GROUP BY agent, model
+    """
+    _SQL_USAGE_ROWS = """
+        SELECT timestamp, agent, model, input_tokens, output_tokens, total_tokens, cost_usd
+        FROM usage_log
+        WHERE epoch >= ?
+        ORDER BY epoch
+    """
+    _SQL_BUDGET = """
+        SELECT budget_usd
+        FROM budget
+        WHERE month = ?
+    """
+    # Monthly spend is summed from usage_log when read (a range scan on the
+    # covering index), so every writer - including older TokenTracker copies
+    # that keep budget.spent_usd themselves - is counted exactly once
+    _SQL_MONTH_SPEND = """
+        SELECT COALESCE(SUM(cost_usd), 0.0)
+        FROM usage_log
+        WHERE epoch >= ? AND epoch < ?
+    """
+    _SQL_SET_BUDGET = """
+        INSERT INTO budget (month, budget_usd, spent_usd)
+        VALUES (?, ?, 0.0)
+        ON CONFLICT(month) DO UPDATE SET budget_usd = ?
+    """
+    
+    def __init_subclass__(cls, **kwargs):
+        """Rebuild the derived lookup tables from the subclass's AGENTS and TOKEN_COSTS."""
+        super().__init_subclass__(**kwargs)
+        cls._COST_TABLE = _build_cost_table(cls.TOKEN_COSTS)
+        cls.AGENTS_SET = frozenset(cls.AGENTS)
+        cls.MODELS_SET = frozenset(cls.TOKEN_COSTS)
+    
+    def __init__(self, db_path: Optional[Path] = None, fast: bool = False):
         """
         Initialize TokenTracker
         
         Args:
             db_path: Optional custom path for SQLite database
+                     (":memory:" for a throwaway in-memory database)
+            fast: Trade durability for speed (for ephemeral databases only)
         """
-        if db_path is None:
-            # Default: store in same directory as script
-            db_path = Path(__file__).parent / "token_usage.db"
-        
-        self.db_path = Path(db_path)
+        self.db_path = Path(db_path) if db_path is not None else _DEFAULT_DB_PATH
+        self.fast = fast
+        # One connection for the lifetime of the tracker. Autocommit mode:
+        # writes group their statements with _transaction(). The connection
+        # may be used from any thread, so every use of it holds _lock.
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+        self._rows_since_analyze = 0
         self._init_database()
     
-    def _validate_agent(self, agent: str) -> str:
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the database and apply the tuning PRAGMAs."""
+        conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,
+            check_same_thread=False,
+            # Room for the hot-path statements plus one multi-row INSERT
+            # template per batch remainder size in log_usage_many
+            cached_statements=256,
+        )
+        for pragma in (self.FAST_PRAGMAS if self.fast else self.DEFAULT_PRAGMAS):
+            conn.execute(pragma)
+        return conn
+    
+    def close(self):
+        """Close the database connection. Safe to call more than once."""
+        with self._lock:
+            try:
+                # Lets SQLite re-analyze tables whose statistics the queries
+                # run on this connection showed to be stale
+                self._conn.execute("PRAGMA optimize")
+            except sqlite3.ProgrammingError:
+                return  # Already closed
+            self._conn.close()
+    
+    def __del__(self):
+        # Safety net for callers (including the CLI) that never call close()
+        if getattr(self, "_conn", None) is not None:
+            try:
+                self.close()
+            except Exception:
+                pass
+    
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed writes as a single BEGIN IMMEDIATE ... COMMIT."""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+    
+    def _fetchone(self, sql: str, params: Sequence = ()) -> Optional[Tuple]:
+        """Run a read-only query and return its first row."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+    
+    @classmethod
+    def _validate_agent(cls, agent: str) -> str:
         """Validate and normalize agent name."""
+        if not isinstance(agent, str):
+            raise ValueError(f"Agent name must be a string, got {agent!r}")
         if not agent or not agent.strip():
             raise ValueError("Agent name cannot be empty.")
         
         agent_upper = agent.strip().upper()
         
         # Check for suspicious characters (basic SQL injection prevention)
-        if any(char in agent for char in [';', '--', '/*', '*/', 'DROP', 'DELETE', 'INSERT', 'UPDATE']):
+        if _INJECTION_RE.search(agent):
             raise ValueError(f"Invalid characters in agent name: {agent}")
         
         # Warn if not a known agent
-        if agent_upper not in self.AGENTS:
-            print(f"[WARNING] Unknown agent: {agent_upper} (will be logged anyway)")
+        if agent_upper not in cls.AGENTS_SET:
+            log.warning("[WARNING] Unknown agent: %s (will be logged anyway)", agent_upper)
         
-        return agent_upper
+        # Interned so repeat lookups on the same name compare by identity
+        return sys.intern(agent_upper)
     
-    def _validate_model(self, model: str) -> str:
+    @classmethod
+    def _validate_model(cls, model: str) -> str:
         """Validate and normalize model name."""
+        if not isinstance(model, str):
+            raise ValueError(f"Model name must be a string, got {model!r}")
         if not model or not model.strip():
             raise ValueError("Model name cannot be empty.")
         
         model_lower = model.strip().lower()
         
-        if model_lower not in self.TOKEN_COSTS:
-            print(f"[WARNING] Unknown model: {model_lower}, using default sonnet-4.5 pricing")
+        if model_lower not in cls.MODELS_SET:
+            log.warning("[WARNING] Unknown model: %s, using default sonnet-4.5 pricing", model_lower)
             # Don't fail, just warn
         
-        return model_lower
+        return sys.intern(model_lower)
     
-    def _validate_tokens(self, input_tokens: int, output_tokens: int) -> Tuple[int, int]:
+    @staticmethod
+    def _validate_tokens(input_tokens: int, output_tokens: int) -> Tuple[int, int]:
         """Validate token counts."""
+        # bool is an int subclass, but True/False are not counts
+        if not isinstance(input_tokens, int) or isinstance(input_tokens, bool):
+            raise ValueError(f"Input tokens must be an integer, got {input_tokens!r}")
+        if not isinstance(output_tokens, int) or isinstance(output_tokens, bool):
+            raise ValueError(f"Output tokens must be an integer, got {output_tokens!r}")
         if input_tokens < 0:
             raise ValueError(f"Input tokens cannot be negative: {input_tokens}")
         if output_tokens < 0:
@@ -108,26 +300,47 @@ class TokenTracker:
         
         return input_tokens, output_tokens
     
-    def _validate_month(self, month: str) -> str:
-        """Validate month format (YYYY-MM)."""
-        import re
-        if not re.match(r'^\d{4}-\d{2}$', month):
+    @staticmethod
+    def _validate_session_id(session_id: Optional[str]) -> Optional[str]:
+        """Validate optional session identifier."""
+        if session_id is not None and not isinstance(session_id, str):
+            raise ValueError(f"Session ID must be a string, got {session_id!r}")
+        
+        return session_id
+    
+    @staticmethod
+    def _validate_notes(notes: Optional[str]) -> Optional[str]:
+        """Validate optional notes, truncating them to 1000 characters."""
+        if notes is None:
+            return None
+        if not isinstance(notes, str):
+            raise ValueError(f"Notes must be a string, got {notes!r}")
+        
+        if len(notes) > 1000:
+            notes = notes[:997] + "..."
+            log.warning("[WARNING] Notes truncated to 1000 characters")
+        
+        return notes
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def _validate_month(month: str) -> str:
+        """Validate month format (YYYY-MM). Valid months are cached; errors are not."""
+        match = _MONTH_RE.match(month)
+        if not match:
             raise ValueError(f"Invalid month format (use YYYY-MM): {month}")
         
-        # Parse to ensure valid date
-        try:
-            year, mon = month.split('-')
-            year_int, mon_int = int(year), int(mon)
-            if not (1900 <= year_int <= 2100):
-                raise ValueError(f"Year out of range: {year_int}")
-            if not (1 <= mon_int <= 12):
-                raise ValueError(f"Month out of range: {mon_int}")
-        except Exception as e:
-            raise ValueError(f"Invalid month format: {month} ({e})")
+        # The regex guarantees two digit groups, so int() cannot fail
+        year_int, mon_int = int(match.group(1)), int(match.group(2))
+        if not (1900 <= year_int <= 2100):
+            raise ValueError(f"Invalid month format: {month} (Year out of range: {year_int})")
+        if not (1 <= mon_int <= 12):
+            raise ValueError(f"Invalid month format: {month} (Month out of range: {mon_int})")
         
         return month
     
-    def _validate_budget(self, amount: float) -> float:
+    @staticmethod
+    def _validate_budget(amount: float) -> float:
         """Validate budget amount."""
         if amount < 0:
             raise ValueError(f"Budget cannot be negative: {amount}")
@@ -138,9 +351,28 @@ class TokenTracker:
     
     def _init_database(self):
         """Initialize SQLite database with required tables."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._transaction() as cursor:
+            self._create_tables(cursor)
         
+        # A database that has data but was never analyzed gives the planner
+        # no selectivity estimates for the covering index
+        if self._fetchone("SELECT 1 FROM usage_log LIMIT 1") and not self._has_planner_stats():
+            self._analyze()
+    
+    def _has_planner_stats(self) -> bool:
+        """Check whether ANALYZE has stored statistics for this database."""
+        if not self._fetchone("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"):
+            return False
+        return self._fetchone("SELECT 1 FROM sqlite_stat1 LIMIT 1") is not None
+    
+    def _analyze(self):
+        """Refresh query planner statistics for usage_log."""
+        with self._lock:
+            self._conn.execute("ANALYZE usage_log")
+            self._rows_since_analyze = 0
+    
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """Create any missing tables."""
         # Token usage log table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS usage_log (
@@ -153,10 +385,45 @@ class TokenTracker:
                 total_tokens INTEGER NOT NULL,
                 cost_usd REAL NOT NULL,
                 session_id TEXT,
-                notes TEXT
+                notes TEXT,
+                epoch INTEGER
             )
         """)
         
+        # Databases created before the epoch column existed: add it (the
+        # backfill below fills it in)
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(usage_log)")]
+        if "epoch" not in columns:
+            cursor.execute("ALTER TABLE usage_log ADD COLUMN epoch INTEGER")
+        
+        # Covering index for get_usage_summary: the period filter is an
+        # integer range scan on epoch and every aggregated column is in the
+        # index, so the summary queries never touch the table rows
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_usage_epoch_cover
+            ON usage_log (epoch, agent, model, input_tokens, output_tokens, total_tokens, cost_usd)
+        """)
+        
+        # Rows written without an epoch (older TokenTracker copies, other
+        # tools, manual inserts) would drop out of every summary period.
+        # Derive it from the local-time ISO timestamp: here for rows already
+        # stored (an index search on epoch IS NULL), by trigger for new ones.
+        cursor.execute("""
+            UPDATE usage_log
+            SET epoch = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+            WHERE epoch IS NULL
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_usage_epoch
+            AFTER INSERT ON usage_log
+            WHEN NEW.epoch IS NULL
+            BEGIN
+                UPDATE usage_log
+                SET epoch = CAST(strftime('%s', NEW.timestamp, 'utc') AS INTEGER)
+                WHERE id = NEW.id;
+            END
+        """)
+        
         # Budget tracking table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS budget (
@@ -167,6 +434,11 @@ class TokenTracker:
             )
         """)
         
+        # Spend is now summed from usage_log on read. Databases that carry
+        # the old rollup trigger would count an older copy's writes twice
+        # (once by the trigger, once by its own spent_usd upsert)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_budget_rollup")
+        
         # Agent profiles table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS agents (
@@ -176,9 +448,6 @@ class TokenTracker:
                 active INTEGER DEFAULT 1
             )
         """)
-        
-        conn.commit()
-        conn.close()
     
     def log_usage(
         self,
@@ -206,59 +475,157 @@ class TokenTracker:
         Raises:
             ValueError: If validation fails
         """
-        # Validate all inputs
-        agent = self._validate_agent(agent)
-        model = self._validate_model(model)
-        input_tokens, output_tokens = self._validate_tokens(input_tokens, output_tokens)
+        entry = self._prepare_entry(agent, model, input_tokens, output_tokens, session_id, notes)
+        return self._log_prepared(*entry)
+    
+    @classmethod
+    def _prepare_entry(
+        cls,
+        agent: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        session_id: Optional[str] = None,
+        notes: Optional[str] = None,
+        names: Optional[Dict[Tuple[str, str], str]] = None
+    ) -> Tuple[str, str, int, int, Optional[str], Optional[str]]:
+        """
+        Validate and normalize one usage entry without touching the database
         
-        # Truncate notes if too long
-        if notes and len(notes) > 1000:
-            notes = notes[:997] + "..."
-            print("[WARNING] Notes truncated to 1000 characters")
+        Args:
+            names: Optional memo of normalized agent and model names shared
+                   across a batch, so each distinct name is validated (and
+                   warned about) once
         
-        # Calculate cost
-        total_tokens = input_tokens + output_tokens
-        cost = self._calculate_cost(model, input_tokens, output_tokens)
+        Returns:
+            (agent, model, input_tokens, output_tokens, session_id, notes),
+            normalized
+        
+        Raises:
+            ValueError: If validation fails
+        """
+        agent = cls._validate_name(cls._validate_agent, agent, names)
+        model = cls._validate_name(cls._validate_model, model, names)
+        input_tokens, output_tokens = cls._validate_tokens(input_tokens, output_tokens)
+        session_id = cls._validate_session_id(session_id)
+        notes = cls._validate_notes(notes)
         
-        # Insert log entry
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return agent, model, input_tokens, output_tokens, session_id, notes
+    
+    @staticmethod
+    def _validate_name(validator, name: str, names: Optional[Dict[Tuple[str, str], str]]) -> str:
+        """Run an agent or model validator, through the names memo when given."""
+        # Non-strings skip the memo (they may be unhashable) and are
+        # rejected by the validator
+        if names is None or not isinstance(name, str):
+            return validator(name)
+        
+        key = (validator.__name__, name)
+        if key not in names:
+            names[key] = validator(name)
+        return names[key]
+    
+    def _log_prepared(
+        self,
+        agent: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        session_id: Optional[str] = None,
+        notes: Optional[str] = None
+    ) -> int:
+        """Cost, insert and report an entry already normalized by _prepare_entry."""
+        timestamp, epoch = _timestamp_now()
+        record = self._make_record(timestamp, epoch, agent, model, input_tokens, output_tokens, session_id, notes)
         
-        timestamp = datetime.now().isoformat()
+        with self._transaction() as cursor:
+            cursor.execute(self._SQL_INSERT_LOG, record)
+            log_id = cursor.lastrowid
         
-        cursor.execute("""
-            INSERT INTO usage_log 
-            (timestamp, agent, model, input_tokens, output_tokens, total_tokens, cost_usd, session_id, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (timestamp, agent, model, input_tokens, output_tokens, total_tokens, cost, session_id, notes))
+        # Guarded: the thousands separator needs an eager format
+        if log.isEnabledFor(logging.INFO):
+            log.info(f"[OK] Logged {input_tokens + output_tokens:,} tokens ({model}) for {agent} - ${record[6]:.4f}")
+        return log_id
+    
+    def _make_record(
+        self,
+        timestamp: str,
+        epoch: int,
+        agent: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        session_id: Optional[str] = None,
+        notes: Optional[str] = None
+    ) -> Tuple:
+        """
+        Cost an entry normalized by _prepare_entry into a usage_log row
+        
+        Returns:
+            Column values in _SQL_INSERT_LOG order
+        """
+        cost = self._calculate_cost(model, input_tokens, output_tokens)
+        return (timestamp, agent, model, input_tokens, output_tokens,
+                input_tokens + output_tokens, cost, session_id, notes, epoch)
+    
+    def log_usage_many(self, rows: Iterable[Sequence]) -> int:
+        """
+        Log many usage entries in a single transaction
         
-        log_id = cursor.lastrowid
+        All rows are validated before anything is written, so a bad row
+        leaves the database untouched. Each distinct agent and model name
+        is validated (and warned about) once per batch.
         
-        # Update monthly budget spent
-        current_month = datetime.now().strftime("%Y-%m")
-        cursor.execute("""
-            INSERT INTO budget (month, budget_usd, spent_usd)
-            VALUES (?, ?, ?)
-            ON CONFLICT(month) DO UPDATE SET spent_usd = spent_usd + ?
-        """, (current_month, self.DEFAULT_BUDGET, cost, cost))
+        Args:
+            rows: Iterable of (agent, model, input_tokens, output_tokens
+                  [, session_id[, notes]]) tuples
         
-        conn.commit()
-        conn.close()
+        Returns:
+            Number of entries logged
         
-        print(f"[OK] Logged {total_tokens:,} tokens ({model}) for {agent} - ${cost:.4f}")
-        return log_id
+        Raises:
+            ValueError: If validation fails for any row (the message names
+                        the row, counting from 1)
+        """
+        # One clock read for the whole batch: every row shares the timestamp
+        timestamp, epoch = _timestamp_now()
+        names: Dict[Tuple[str, str], str] = {}
+        
+        records = []
+        for row_no, row in enumerate(rows, 1):
+            try:
+                if not 4 <= len(row) <= 6:
+                    raise ValueError(f"Expected 4 to 6 fields per row, got {len(row)}: {row!r}")
+                entry = self._prepare_entry(*row, names=names)
+            except ValueError as e:
+                raise ValueError(f"Row {row_no}: {e}") from e
+            records.append(self._make_record(timestamp, epoch, *entry))
+        
+        if not records:
+            return 0
+        
+        # The row counter is tracker state too, so it is updated under the
+        # same lock as the insert
+        with self._lock:
+            with self._transaction() as cursor:
+                # Multi-row INSERTs: every full chunk reuses one prepared statement
+                for start in range(0, len(records), self.INSERT_CHUNK_SIZE):
+                    chunk = records[start:start + self.INSERT_CHUNK_SIZE]
+                    cursor.execute(_insert_usage_sql(len(chunk)), [value for record in chunk for value in record])
+            
+            self._rows_since_analyze += len(records)
+            if self._rows_since_analyze >= self.ANALYZE_ROW_THRESHOLD:
+                self._analyze()
+        
+        log.info("[OK] Logged %d entries - $%.4f", len(records), sum(record[6] for record in records))
+        return len(records)
     
     def _calculate_cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
-        """Calculate cost in USD for given token usage."""
-        if model not in self.TOKEN_COSTS:
-            print(f"[WARNING] Unknown model: {model}, using default sonnet-4.5 pricing")
-            model = "sonnet-4.5"
-        
-        pricing = self.TOKEN_COSTS[model]
-        input_cost = (input_tokens / 1_000_000) * pricing["input"]
-        output_cost = (output_tokens / 1_000_000) * pricing["output"]
-        
-        return input_cost + output_cost
+        """Calculate cost in USD for given token usage (unknown models use sonnet-4.5 pricing)."""
+        # _validate_model has already warned about unknown models
+        # The rates come from this class's table, so subclasses can add models
+        input_rate, output_rate = self._COST_TABLE.get(model) or self._COST_TABLE["sonnet-4.5"]
+        return _calculate_cost_cached(input_rate, output_rate, input_tokens, output_tokens)
     
     def get_usage_summary(self, period: str = "today") -> Dict:
         """
@@ -270,112 +637,91 @@ class TokenTracker:
         Returns:
             Dictionary with usage statistics
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Determine time filter
-        if period == "today":
-            start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        elif period == "week":
-            start_date = datetime.now() - timedelta(days=7)
-        elif period == "month":
-            start_date = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        else:  # all
-            start_date = datetime(2020, 1, 1)
-        
-        start_date_str = start_date.isoformat()
-        
-        # Get total usage
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as sessions,
-                SUM(input_tokens) as total_input,
-                SUM(output_tokens) as total_output,
-                SUM(total_tokens) as total_tokens,
-                SUM(cost_usd) as total_cost
-            FROM usage_log
-            WHERE timestamp >= ?
-        """, (start_date_str,))
-        
-        row = cursor.fetchone()
-        
-        # Get per-agent breakdown
-        cursor.execute("""
-            SELECT 
-                agent,
-                COUNT(*) as sessions,
-                SUM(total_tokens) as total_tokens,
-                SUM(cost_usd) as total_cost
-            FROM usage_log
-            WHERE timestamp >= ?
-            GROUP BY agent
-            ORDER BY total_cost DESC
-        """, (start_date_str,))
-        
-        agents = []
-        for row2 in cursor.fetchall():
-            agents.append({
-                "agent": row2[0],
-                "sessions": row2[1],
-                "tokens": row2[2],
-                "cost": row2[3]
-            })
-        
-        # Get per-model breakdown
-        cursor.execute("""
-            SELECT 
-                model,
-                SUM(total_tokens) as total_tokens,
-                SUM(cost_usd) as total_cost
-            FROM usage_log
-            WHERE timestamp >= ?
-            GROUP BY model
-            ORDER BY total_cost DESC
-        """, (start_date_str,))
-        
-        models = []
-        for row3 in cursor.fetchall():
-            models.append({
-                "model": row3[0],
-                "tokens": row3[1],
-                "cost": row3[2]
-            })
-        
-        conn.close()
+        start_date_str, start_epoch = _period_bounds(period, datetime.now().date())
+        
+        agents: Dict[str, Dict] = {}
+        models: Dict[str, Dict] = {}
+        total_input = total_output = 0
+        
+        # Rows by column name, so the rollup does not depend on the SELECT
+        # order; the cursor is iterated directly, never materialized
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            for row in cursor.execute(self._SQL_SUMMARY, (start_epoch,)):
+                agent, model = row["agent"], row["model"]
+                tokens, cost = row["total_tokens"], row["total_cost"]
+                
+                agent_entry = agents.setdefault(agent, {"agent": agent, "sessions": 0, "tokens": 0, "cost": 0.0})
+                agent_entry["sessions"] += row["sessions"]
+                agent_entry["tokens"] += tokens
+                agent_entry["cost"] += cost
+                
+                model_entry = models.setdefault(model, {"model": model, "tokens": 0, "cost": 0.0})
+                model_entry["tokens"] += tokens
+                model_entry["cost"] += cost
+                
+                total_input += row["total_input"]
+                total_output += row["total_output"]
+        
+        agent_list = sorted(agents.values(), key=lambda entry: entry["cost"], reverse=True)
+        model_list = sorted(models.values(), key=lambda entry: entry["cost"], reverse=True)
         
         return {
             "period": period,
             "start_date": start_date_str,
-            "sessions": row[0] or 0,
-            "input_tokens": row[1] or 0,
-            "output_tokens": row[2] or 0,
-            "total_tokens": row[3] or 0,
-            "total_cost": row[4] or 0.0,
-            "agents": agents,
-            "models": models
+            "sessions": sum(entry["sessions"] for entry in agent_list),
+            "input_tokens": total_input,
+            "output_tokens": total_output,
+            "total_tokens": sum(entry["tokens"] for entry in agent_list),
+            "total_cost": sum(entry["cost"] for entry in agent_list) if agent_list else 0.0,
+            "agents": agent_list,
+            "models": model_list
         }
     
-    def get_budget_status(self) -> Dict:
-        """Get current month's budget status."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_usage_dataframe(self, start: Optional[datetime] = None):
+        """
+        Get raw usage rows as a pandas DataFrame (requires pandas)
         
-        current_month = datetime.now().strftime("%Y-%m")
+        For large reports and dashboards: group and aggregate with pandas,
+        e.g. df.groupby("agent")[["total_tokens", "cost_usd"]].sum().
         
-        cursor.execute("""
-            SELECT budget_usd, spent_usd
-            FROM budget
-            WHERE month = ?
-        """, (current_month,))
+        Args:
+            start: Only include entries at or after this time (default: all)
+        
+        Returns:
+            DataFrame with timestamp, agent, model, input_tokens,
+            output_tokens, total_tokens and cost_usd columns
+        
+        Raises:
+            ImportError: If pandas is not installed
+        """
+        # Optional dependency: imported here so the rest of TokenTracker
+        # stays zero-dependency
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("get_usage_dataframe requires pandas (pip install tokentracker[dataframe])") from None
+        
+        start_epoch = int(start.timestamp()) if start is not None else 0
+        with self._lock:
+            return pd.read_sql_query(
+                self._SQL_USAGE_ROWS, self._conn, params=(start_epoch,), parse_dates=["timestamp"]
+            )
+    
+    def get_budget_status(self) -> Dict:
+        """Get current month's budget status."""
+        now = datetime.now()
+        current_month = now.strftime("%Y-%m")
+        start_epoch, end_epoch = _month_epoch_range(now.date())
         
-        row = cursor.fetchone()
-        conn.close()
+        with self._lock:
+            row = self._fetchone(self._SQL_BUDGET, (current_month,))
+            spent = self._fetchone(self._SQL_MONTH_SPEND, (start_epoch, end_epoch))[0]
         
-        if row:
-            budget, spent = row
-        else:
-            budget = self.DEFAULT_BUDGET
-            spent = 0.0
+        # Months without a set budget use the class default at read time
+        budget = row[0] if row else self.DEFAULT_BUDGET
         
         remaining = budget - spent
         percent_used = (spent / budget * 100) if budget > 0 else 0
@@ -398,28 +744,23 @@ class TokenTracker:
         """
         month = self._validate_month(month)
         amount = self._validate_budget(amount)
+        self._set_budget_prepared(month, amount)
+    
+    def _set_budget_prepared(self, month: str, amount: float):
+        """Store a month's budget already checked by the validators."""
+        with self._transaction() as cursor:
+            cursor.execute(self._SQL_SET_BUDGET, (month, amount, amount))
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO budget (month, budget_usd, spent_usd)
-            VALUES (?, ?, 0.0)
-            ON CONFLICT(month) DO UPDATE SET budget_usd = ?
-        """, (month, amount, amount))
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"[OK] Set budget for {month}: ${amount:.2f}")
+        log.info("[OK] Set budget for %s: $%.2f", month, amount)
     
-    def export_report(self, period: str = "month", format: str = "json") -> str:
+    def export_report(self, period: str = "month", format: str = "json", pretty: bool = False) -> str:
         """
         Export usage report
         
         Args:
             period: "today", "week", "month", or "all"
             format: "json" or "text"
+            pretty: Indent JSON output (compact by default)
         
         Returns:
             Formatted report string
@@ -433,68 +774,200 @@ class TokenTracker:
                 "budget": budget,
                 "generated_at": datetime.now().isoformat()
             }
-            return json.dumps(report, indent=2)
+            return _json_dumps()(report, pretty)
         
         else:  # text format
-            lines = []
-            lines.append("=" * 60)
-            lines.append(f"TOKEN TRACKER REPORT - {period.upper()}")
-            lines.append("=" * 60)
-            lines.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            lines.append("")
-            
-            lines.append("BUDGET STATUS:")
-            lines.append(f"  Month: {budget['month']}")
-            lines.append(f"  Budget: ${budget['budget']:.2f}")
-            lines.append(f"  Spent: ${budget['spent']:.2f}")
-            lines.append(f"  Remaining: ${budget['remaining']:.2f}")
-            lines.append(f"  Usage: {budget['percent_used']:.1f}%")
-            lines.append(f"  Status: {'[OK] On Track' if budget['on_track'] else '[WARNING] Over Budget!'}")
-            lines.append("")
-            
-            lines.append("USAGE SUMMARY:")
-            lines.append(f"  Sessions: {summary['sessions']}")
-            lines.append(f"  Input Tokens: {summary['input_tokens']:,}")
-            lines.append(f"  Output Tokens: {summary['output_tokens']:,}")
-            lines.append(f"  Total Tokens: {summary['total_tokens']:,}")
-            lines.append(f"  Total Cost: ${summary['total_cost']:.2f}")
-            lines.append("")
+            status = '[OK] On Track' if budget['on_track'] else '[WARNING] Over Budget!'
+            sections = [f"""{_RULE}
+TOKEN TRACKER REPORT - {period.upper()}
+{_RULE}
+Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+BUDGET STATUS:
+  Month: {budget['month']}
+  Budget: ${budget['budget']:.2f}
+  Spent: ${budget['spent']:.2f}
+  Remaining: ${budget['remaining']:.2f}
+  Usage: {budget['percent_used']:.1f}%
+  Status: {status}
+
+USAGE SUMMARY:
+  Sessions: {summary['sessions']}
+  Input Tokens: {summary['input_tokens']:,}
+  Output Tokens: {summary['output_tokens']:,}
+  Total Tokens: {summary['total_tokens']:,}
+  Total Cost: ${summary['total_cost']:.2f}
+"""]
             
             if summary['agents']:
-                lines.append("BY AGENT:")
-                for agent in summary['agents']:
-                    lines.append(f"  {agent['agent']:10} | {agent['tokens']:>12,} tokens | ${agent['cost']:>8.2f} | {agent['sessions']:>3} sessions")
-                lines.append("")
+                sections.append("BY AGENT:")
+                sections.extend(
+                    f"  {agent['agent']:10} | {agent['tokens']:>12,} tokens | ${agent['cost']:>8.2f} | {agent['sessions']:>3} sessions"
+                    for agent in summary['agents']
+                )
+                sections.append("")
             
             if summary['models']:
-                lines.append("BY MODEL:")
-                for model in summary['models']:
-                    lines.append(f"  {model['model']:12} | {model['tokens']:>12,} tokens | ${model['cost']:>8.2f}")
-                lines.append("")
+                sections.append("BY MODEL:")
+                sections.extend(
+                    f"  {model['model']:12} | {model['tokens']:>12,} tokens | ${model['cost']:>8.2f}"
+                    for model in summary['models']
+                )
+                sections.append("")
             
-            lines.append("=" * 60)
+            sections.append(_RULE)
             
-            return "\n".join(lines)
+            return "\n".join(sections)
+
+
+@functools.lru_cache(maxsize=4096)
+def _calculate_cost_cached(input_rate: float, output_rate: float, input_tokens: int, output_tokens: int) -> float:
+    """Cost in USD at per-token rates. Token counts repeat a lot, so cache them."""
+    return input_tokens * input_rate + output_tokens * output_rate
+
+
+def read_batch_file(path: Path) -> List[Tuple]:
+    """
+    Read usage entries from a JSON Lines file for log_usage_many
+    
+    Each non-blank line is an object with "agent", "model", "input_tokens"
+    and "output_tokens", plus optional "session_id" and "notes". Field
+    values are checked by log_usage_many, like any other rows.
+    
+    Raises:
+        ValueError: If a line is not valid JSON or lacks a required key
+    """
+    import json
+    
+    rows = []
+    with open(path, encoding="utf-8") as fh:
+        for line_no, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                row = (
+                    entry["agent"],
+                    entry["model"],
+                    entry["input_tokens"],
+                    entry["output_tokens"],
+                    entry.get("session_id"),
+                    entry.get("notes"),
+                )
+            except KeyError as e:
+                raise ValueError(f"{path}:{line_no}: missing key {e}") from e
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"{path}:{line_no}: invalid entry ({e})") from e
+            rows.append(row)
+    return rows
+
+
+@functools.lru_cache(maxsize=None)
+def _json_dumps():
+    """
+    JSON encoder for reports, resolved on first use
+    
+    Uses orjson when it is installed (optional, much faster) and the
+    stdlib encoder otherwise. Importing here means only JSON reports pay
+    for either import.
+    
+    Returns:
+        Function (obj, pretty) -> str
+    """
+    try:
+        import orjson
+    except ImportError:
+        import json
+        
+        def dumps(obj, pretty):
+            if pretty:
+                return json.dumps(obj, indent=2)
+            return json.dumps(obj, separators=(",", ":"))
+    else:
+        def dumps(obj, pretty):
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
+    
+    return dumps
+
+
+@functools.lru_cache(maxsize=32)
+def _period_bounds(period: str, today: date) -> Tuple[str, int]:
+    """
+    Start of a summary period as (ISO string, epoch seconds)
+    
+    Every bound is anchored to a midnight, so the result only changes when
+    the date does and is cached per (period, today). "week" starts at
+    midnight seven days ago. "all" has no lower bound: its epoch is 0 (the
+    reported start_date stays 2020-01-01).
+    
+    Bounds are computed here rather than with SQLite's date('now', ...)
+    modifiers so that summaries read the same clock (and local time zone)
+    that log_usage stamps rows with.
+    """
+    if period not in ("today", "week", "month"):  # all
+        return _ALL_START_DATE, 0
+    
+    midnight = datetime.combine(today, dt_time())
+    if period == "today":
+        start_date = midnight
+    elif period == "week":
+        start_date = midnight - timedelta(days=7)
+    else:  # month
+        start_date = midnight.replace(day=1)
+    
+    return start_date.isoformat(), int(start_date.timestamp())
+
 
+def _timestamp_now() -> Tuple[str, int]:
+    """Current local time as (ISO timestamp to the second, epoch seconds), from one clock read."""
+    now = datetime.now()
+    return now.isoformat(timespec="seconds"), int(now.timestamp())
 
-def main():
-    """CLI interface for TokenTracker."""
+
+@functools.lru_cache(maxsize=32)
+def _month_epoch_range(today: date) -> Tuple[int, int]:
+    """
+    Epoch seconds [start, end) of the local calendar month containing today
     
-    if len(sys.argv) < 2:
-        print("""
+    Cached per day like _period_bounds.
+    """
+    start = datetime.combine(today.replace(day=1), dt_time())
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+@functools.lru_cache(maxsize=None)
+def _insert_usage_sql(row_count: int) -> str:
+    """INSERT statement for row_count usage_log rows in one VALUES list."""
+    placeholders = ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"] * row_count)
+    return (
+        "INSERT INTO usage_log "
+        "(timestamp, agent, model, input_tokens, output_tokens, total_tokens, cost_usd, session_id, notes, epoch) "
+        f"VALUES {placeholders}"
+    )
+
+
+_USAGE = """
 TokenTracker v1.0 - Token Usage Monitor for Team Brain
 
 USAGE:
   tokentracker.py log <agent> <model> <input_tokens> <output_tokens> [notes]
+  tokentracker.py log-batch <file.jsonl>
   tokentracker.py summary [today|week|month|all]
   tokentracker.py budget
   tokentracker.py set-budget <YYYY-MM> <amount>
-  tokentracker.py report [today|week|month|all] [json|text]
+  tokentracker.py report [today|week|month|all] [json|text] [--pretty]
 
 EXAMPLES:
   # Log token usage
   tokentracker.py log ATLAS sonnet-4.5 50000 15000 "Built TokenTracker"
   
+  # Log many entries in one transaction (one JSON object per line)
+  tokentracker.py log-batch sessions.jsonl
+  
   # View summary
   tokentracker.py summary today
   tokentracker.py summary month
@@ -508,75 +981,174 @@ EXAMPLES:
   # Export report
   tokentracker.py report month text
   tokentracker.py report all json > report.json
+  tokentracker.py report all json --pretty
 
 AGENTS: FORGE, ATLAS, CLIO, NEXUS, BOLT, GEMINI
 MODELS: opus-4.5, sonnet-4.5, sonnet-3.5, haiku-3.5, grok, gemini
-""")
-        sys.exit(1)
+"""
+
+
+@contextmanager
+def _open_tracker():
+    """
+    Open the default database for one CLI command and close it afterwards
     
-    command = sys.argv[1].lower()
+    Handlers call this only once their own arguments have been checked:
+    usage errors, invalid log entries, months and budget amounts, and
+    unreadable or malformed batch files never open (or create) the
+    database. Batch entries' fields are checked later, by
+    log_usage_many, which writes nothing if any entry fails.
+    """
     tracker = TokenTracker()
+    try:
+        yield tracker
+    finally:
+        tracker.close()
+
+
+def _cmd_log(args):
+    """Log a single usage entry."""
+    notes = " ".join(args.notes) if args.notes else None
+    entry = TokenTracker._prepare_entry(args.agent, args.model, args.input_tokens, args.output_tokens, notes=notes)
+    with _open_tracker() as tracker:
+        tracker._log_prepared(*entry)
+
+
+def _cmd_log_batch(args):
+    """Log every entry of a JSON Lines file in one transaction."""
+    rows = read_batch_file(args.file)
+    with _open_tracker() as tracker:
+        tracker.log_usage_many(rows)
+
+
+def _cmd_summary(args):
+    """Print a usage summary."""
+    with _open_tracker() as tracker:
+        summary = tracker.get_usage_summary(args.period)
     
-    if command == "log":
-        if len(sys.argv) < 6:
-            print("[ERROR] Usage: tokentracker.py log <agent> <model> <input_tokens> <output_tokens> [notes]")
-            sys.exit(1)
-        
-        agent = sys.argv[2]
-        model = sys.argv[3]
-        input_tokens = int(sys.argv[4])
-        output_tokens = int(sys.argv[5])
-        notes = " ".join(sys.argv[6:]) if len(sys.argv) > 6 else None
-        
-        tracker.log_usage(agent, model, input_tokens, output_tokens, notes=notes)
+    print(f"\n=== TOKEN USAGE SUMMARY ({args.period.upper()}) ===")
+    print(f"Sessions: {summary['sessions']}")
+    print(f"Total Tokens: {summary['total_tokens']:,}")
+    print(f"Total Cost: ${summary['total_cost']:.2f}")
+    print()
     
-    elif command == "summary":
-        period = sys.argv[2] if len(sys.argv) > 2 else "month"
-        summary = tracker.get_usage_summary(period)
-        
-        print(f"\n=== TOKEN USAGE SUMMARY ({period.upper()}) ===")
-        print(f"Sessions: {summary['sessions']}")
-        print(f"Total Tokens: {summary['total_tokens']:,}")
-        print(f"Total Cost: ${summary['total_cost']:.2f}")
+    if summary['agents']:
+        print("BY AGENT:")
+        for agent in summary['agents']:
+            print(f"  {agent['agent']:10} | {agent['tokens']:>12,} tokens | ${agent['cost']:>8.2f}")
         print()
-        
-        if summary['agents']:
-            print("BY AGENT:")
-            for agent in summary['agents']:
-                print(f"  {agent['agent']:10} | {agent['tokens']:>12,} tokens | ${agent['cost']:>8.2f}")
-            print()
-    
-    elif command == "budget":
+
+
+def _cmd_budget(args):
+    """Print the current month's budget status."""
+    with _open_tracker() as tracker:
         budget = tracker.get_budget_status()
-        
-        print(f"\n=== BUDGET STATUS ({budget['month']}) ===")
-        print(f"Budget: ${budget['budget']:.2f}")
-        print(f"Spent: ${budget['spent']:.2f}")
-        print(f"Remaining: ${budget['remaining']:.2f}")
-        print(f"Usage: {budget['percent_used']:.1f}%")
-        print(f"Status: {'[OK] On Track' if budget['on_track'] else '[WARNING] Over Budget!'}")
-        print()
     
-    elif command == "set-budget":
-        if len(sys.argv) < 4:
-            print("[ERROR] Usage: tokentracker.py set-budget <YYYY-MM> <amount>")
-            sys.exit(1)
-        
-        month = sys.argv[2]
-        amount = float(sys.argv[3])
-        tracker.set_budget(month, amount)
+    print(f"\n=== BUDGET STATUS ({budget['month']}) ===")
+    print(f"Budget: ${budget['budget']:.2f}")
+    print(f"Spent: ${budget['spent']:.2f}")
+    print(f"Remaining: ${budget['remaining']:.2f}")
+    print(f"Usage: {budget['percent_used']:.1f}%")
+    print(f"Status: {'[OK] On Track' if budget['on_track'] else '[WARNING] Over Budget!'}")
+    print()
+
+
+def _cmd_set_budget(args):
+    """Set the budget for a month."""
+    month = TokenTracker._validate_month(args.month)
+    amount = TokenTracker._validate_budget(args.amount)
+    with _open_tracker() as tracker:
+        tracker._set_budget_prepared(month, amount)
+
+
+def _cmd_report(args):
+    """Print a usage report."""
+    with _open_tracker() as tracker:
+        report = tracker.export_report(args.period, args.format, pretty=args.pretty)
+    print(report)
+
+
+# Subcommand name -> handler(args)
+_COMMANDS = {
+    "log": _cmd_log,
+    "log-batch": _cmd_log_batch,
+    "summary": _cmd_summary,
+    "budget": _cmd_budget,
+    "set-budget": _cmd_set_budget,
+    "report": _cmd_report,
+}
+
+
+def _build_parser():
+    """Build the argparse parser for the CLI subcommands."""
+    # Imported here: only the CLI needs it
+    import argparse
     
-    elif command == "report":
-        period = sys.argv[2] if len(sys.argv) > 2 else "month"
-        format = sys.argv[3] if len(sys.argv) > 3 else "text"
-        
-        report = tracker.export_report(period, format)
-        print(report)
+    periods = ["today", "week", "month", "all"]
     
-    else:
-        print(f"[ERROR] Unknown command: {command}")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        prog="tokentracker.py",
+        description="TokenTracker v1.0 - Token Usage Monitor for Team Brain",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    p_log = sub.add_parser("log", help="log token usage")
+    p_log.add_argument("agent")
+    p_log.add_argument("model")
+    p_log.add_argument("input_tokens", type=int)
+    p_log.add_argument("output_tokens", type=int)
+    p_log.add_argument("notes", nargs=argparse.REMAINDER)
+    
+    p_batch = sub.add_parser("log-batch", help="log a JSON Lines file of entries")
+    p_batch.add_argument("file", type=Path)
+    
+    p_summary = sub.add_parser("summary", help="show a usage summary")
+    p_summary.add_argument("period", nargs="?", default="month", choices=periods)
+    
+    sub.add_parser("budget", help="show this month's budget status")
+    
+    p_set = sub.add_parser("set-budget", help="set the budget for a month")
+    p_set.add_argument("month", help="YYYY-MM")
+    p_set.add_argument("amount", type=float)
+    
+    p_report = sub.add_parser("report", help="export a usage report")
+    p_report.add_argument("period", nargs="?", default="month", choices=periods)
+    p_report.add_argument("format", nargs="?", default="text", choices=["json", "text"])
+    p_report.add_argument("--pretty", action="store_true", help="indent JSON output")
+    
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    CLI interface for TokenTracker
+    
+    Args:
+        argv: Command-line arguments (default: sys.argv[1:])
+    
+    Returns:
+        Process exit status
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv:
+        print(_USAGE)
+        return 1
+    
+    # Command names are case-insensitive
+    argv[0] = argv[0].lower()
+    args = _build_parser().parse_args(argv)
+    
+    # Library messages go to stdout exactly as plain prints did
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    
+    try:
+        _COMMANDS[args.command](args)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())